@@ -0,0 +1,295 @@
+"""Load and micro benchmarks for the API against local stand-ins.
+
+MongoDB is replaced in-process by mongomock-motor and MinIO by a moto S3
+server running in a subprocess, so the suite needs no external services.
+The app is driven through its ASGI interface with httpx, lifespan
+included.
+
+Usage
+-----
+    $ pip install -r benchmarks/requirements.txt
+    $ python -m benchmarks.bench --output bench.json
+    $ python -m benchmarks.bench --baseline bench.json --tolerance 0.25
+
+With `--baseline`, the run exits with status 1 when the p95 latency of any
+scenario regresses by more than the tolerance.
+
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+from urllib.request import urlopen
+
+
+MB = 1024 * 1024
+UPLOAD_SIZES = [1 * MB, 5 * MB, 20 * MB]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_s3_server(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urlopen(f"http://127.0.0.1:{port}/moto-api/", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError("Fake S3 server did not start")
+
+
+def configure_environment(s3_port: int):
+    """Points the app config at the stand-ins. Must run before importing src."""
+
+    os.environ.update(
+        {
+            "DEVELOPMENT": "false",
+            "SECRET_KEY": "benchmark",
+            "RATE_LIMIT_ENABLED": "false",
+            # mongomock implements neither the hello command nor change streams
+            "INVALIDATION_ENABLED": "false",
+            # Measure the user lookup, not cache hits
+            "USER_CACHE_TTL_SECONDS": "0",
+            "UPLOAD_MAX_CONCURRENCY": "1000",
+            "MINIO_URL": f"127.0.0.1:{s3_port}",
+            "MINIO_ACCESS_KEY": "benchmark",
+            "MINIO_SECRET_KEY": "benchmark",
+            "MINIO_SECURE": "false",
+            "MINIO_BUCKET": "benchmark",
+        }
+    )
+
+
+def patch_mongo():
+    """Makes every Motor client share a single in-memory mongomock server.
+
+    Applied after importing the app, which only resolves the client class
+    when connecting.
+
+    """
+
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    shared = AsyncMongoMockClient()
+    shared.close = lambda: None
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: shared
+
+
+def summarize(name: str, latencies: list[float], elapsed: float, errors: int):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else []
+
+    def percentile(p: int) -> float:
+        if not quantiles:
+            return latencies[0] * 1000 if latencies else 0.0
+        return quantiles[p - 1] * 1000
+
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+async def load(name: str, call, requests: int, concurrency: int) -> dict:
+    """Runs `call(i)` `requests` times with at most `concurrency` in flight."""
+
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await call(i)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, time.perf_counter() - start, errors)
+
+
+async def micro(name: str, call, iterations: int) -> dict:
+    latencies: list[float] = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, time.perf_counter() - start, 0)
+
+
+async def run(args) -> list[dict]:
+    import httpx
+    from fastapi.security import SecurityScopes
+
+    from src.app import app
+    from src.auth import get_current_user
+    from src.minio.minio import generate_presigned_url
+
+    patch_mongo()
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=60
+    ) as client:
+        response = await client.post(
+            "/token", data={"username": "admin", "password": "admin"}
+        )
+        token = response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def upload(size: int) -> httpx.Response:
+            return await client.post(
+                "/memes/",
+                params={"title": "benchmark", "description": "benchmark"},
+                files={"file": ("meme.png", os.urandom(size), "image/png")},
+                headers=headers,
+            )
+
+        # Seed the feed
+        ids = []
+        for _ in range(args.seed):
+            response = await upload(16 * 1024)
+            ids.append(response.json()["id"])
+
+        async def get_memes(i: int) -> bool:
+            page = i % max(1, args.seed // 10) + 1
+            response = await client.get("/memes/", params={"page": page})
+            return response.status_code == 200
+
+        async def like_meme(i: int) -> bool:
+            response = await client.put(f"/memes/{ids[i % len(ids)]}", headers=headers)
+            return response.status_code == 200
+
+        async def login(_: int) -> bool:
+            response = await client.post(
+                "/token", data={"username": "admin", "password": "admin"}
+            )
+            return response.status_code == 200
+
+        def upload_of(size: int):
+            async def call(_: int) -> bool:
+                response = await upload(size)
+                return response.status_code == 200
+
+            return call
+
+        results.append(
+            await load("GET /memes/", get_memes, args.requests, args.concurrency)
+        )
+        results.append(
+            await load("PUT /memes/{id}", like_meme, args.requests, args.concurrency)
+        )
+        results.append(
+            await load("POST /token", login, args.login_requests, args.concurrency)
+        )
+        for size in UPLOAD_SIZES:
+            results.append(
+                await load(
+                    f"POST /memes/ {size // MB}MB",
+                    upload_of(size),
+                    args.upload_requests,
+                    args.concurrency,
+                )
+            )
+
+    async with app.router.lifespan_context(app):
+
+        async def current_user():
+            await get_current_user(SecurityScopes([]), token)
+
+        async def presign():
+            generate_presigned_url("benchmark.png")
+
+        results.append(await micro("get_current_user", current_user, args.iterations))
+        results.append(await micro("generate_presigned_url", presign, args.iterations))
+
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if not before or not before["p95_ms"]:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        if change > tolerance:
+            regressions.append(
+                f"{result['name']}: p95 {before['p95_ms']:.2f}ms -> "
+                f"{result['p95_ms']:.2f}ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--upload-requests", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=100, help="memes to seed")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    s3_port = free_port()
+    s3_server = start_s3_server(s3_port)
+    try:
+        configure_environment(s3_port)
+        results = asyncio.run(run(args))
+    finally:
+        s3_server.terminate()
+        s3_server.wait()
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,58 @@
+import os
+import shutil
+import tempfile
+
 import uvicorn
 
-from src.config import DEVELOPMENT
+from src.config import (
+    DEVELOPMENT,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_KEEP_ALIVE,
+    SERVER_BACKLOG,
+    SERVER_LIMIT_CONCURRENCY,
+    FORWARDED_ALLOW_IPS,
+)
+
+
+def prepare_metrics_dir():
+    # Workers write their samples here so /metrics can aggregate them
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "prometheus-multiproc")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+    # Samples of a previous run would be merged into the new ones
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "src.app:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=DEVELOPMENT,
-        log_config="logging.json",
-    )
+    if DEVELOPMENT:
+        uvicorn.run(
+            "src.app:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            reload=True,
+            log_config="logging.json",
+        )
+    else:
+        if SERVER_WORKERS > 1:
+            prepare_metrics_dir()
+
+        # "auto" picks uvloop and httptools when they are installed
+        uvicorn.run(
+            "src.app:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            workers=SERVER_WORKERS,
+            loop="auto",
+            http="auto",
+            backlog=SERVER_BACKLOG,
+            timeout_keep_alive=SERVER_KEEP_ALIVE,
+            limit_concurrency=SERVER_LIMIT_CONCURRENCY,
+            proxy_headers=True,
+            forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+            log_config="logging.json",
+        )
@@ -1,12 +1,25 @@
+import asyncio
 import logging
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
+from src import database
 from src.auth import create_admin_user
-from src.config import FASTAPI_CONFIG, MIDDLEWARE_CONFIG, DEVELOPMENT
+from src.invalidation import bus
+from src.minio.cache import get_image_cache
+from src.metrics import MetricsMiddleware, StartupTimer
+from src.throttling import RateLimitMiddleware, UploadGateMiddleware
+from src.config import (
+    FASTAPI_CONFIG,
+    MIDDLEWARE_CONFIG,
+    DEVELOPMENT,
+    ADMIN_BOOTSTRAP,
+    INVALIDATION_ENABLED,
+)
 from src.routes.auth.auth import router as auth_router
+from src.routes.metrics.metrics import router as metrics_router
 
 from src.routes.memes.memes import router as memes_router
 
@@ -14,23 +27,44 @@ from src.routes.memes.memes import router as memes_router
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # Start of the application
+    startup = StartupTimer()
     if DEVELOPMENT:
         logging.warning("Running in development mode!")
 
+    # Clients are created here so each worker process gets its own
+    with startup.phase("mongo"):
+        database.connect()
+
     # Create the admin user if it does not exist
-    user = await create_admin_user()
-    if user:
-        logging.warning("Admin user created!")
+    if ADMIN_BOOTSTRAP:
+        with startup.phase("admin_bootstrap"):
+            user = await create_admin_user()
+        if user:
+            logging.warning("Admin user created!")
+
+    # Scanning the cache directory must not block the event loop
+    with startup.phase("image_cache"):
+        await asyncio.to_thread(get_image_cache)
+
+    # Keep in-process caches in sync with writes from other workers
+    if INVALIDATION_ENABLED:
+        with startup.phase("invalidation"):
+            await bus.start()
 
-    yield
+    yield {"startup": startup.report()}
 
     # End of the application
-    pass
+    await bus.stop()
+    database.disconnect()
 
 
 app = FastAPI(**FASTAPI_CONFIG, lifespan=lifespan)
+app.add_middleware(UploadGateMiddleware)
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(CORSMiddleware, **MIDDLEWARE_CONFIG)
+app.add_middleware(MetricsMiddleware)
 
 # Endpoints
 app.include_router(auth_router, tags=["Users and Authentication"])
 app.include_router(memes_router, tags=["Memes"])
+app.include_router(metrics_router)
@@ -1,3 +1,5 @@
+import logging
+
 from typing import Annotated
 from datetime import datetime, timedelta, timezone
 
@@ -7,9 +9,18 @@ from fastapi.security import SecurityScopes, OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel, ValidationError
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
+from src.metrics import timed
+from src.cache import TTLCache
+from src.invalidation import bus
 from src.database import MongoDBConnectionManager
-from src.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_DURATION_MINUTES
+from src.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_DURATION_MINUTES,
+    USER_CACHE_TTL_SECONDS,
+)
 
 
 # Scopes
@@ -71,13 +82,21 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", scopes=SCOPES)
 
+# Users resolved from tokens, only used while the invalidation bus runs so
+# writes from other workers are seen. Events only carry the document id, so
+# any write to users flushes the whole cache
+user_cache = TTLCache(USER_CACHE_TTL_SECONDS)
+bus.subscribe("users", lambda _: user_cache.clear())
+
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("bcrypt.verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with timed("bcrypt.hash"):
+        return pwd_context.hash(password)
 
 
 async def get_user(db: AsyncIOMotorDatabase, username: str):
@@ -124,7 +143,8 @@ async def get_current_user(
         headers={"WWW-Authenticate": authenticate_value},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with timed("jwt.decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub", "")
         if username == "":
             raise credentials_exception
@@ -132,9 +152,13 @@ async def get_current_user(
         token_data = TokenData(scopes=token_scopes, username=username)
     except (JWTError, ValidationError):
         raise credentials_exception
-    async with MongoDBConnectionManager() as db:
-        usernamestring = token_data.username if token_data.username else ""
-        user = await get_user(db, username=usernamestring)
+    usernamestring = token_data.username if token_data.username else ""
+    user = user_cache.get(usernamestring) if bus.running else None
+    if user is None:
+        async with MongoDBConnectionManager() as db:
+            user = await get_user(db, username=usernamestring)
+        if user is not None and bus.running:
+            user_cache.set(usernamestring, user)
     if user is None:
         raise credentials_exception
     for scope in security_scopes.scopes:
@@ -155,16 +179,41 @@ async def current_active_user(current_user: User = Depends(get_current_user)):
 
 
 async def create_admin_user():
+    """Creates the default admin user when the database has no users.
+
+    Safe to run from every worker and replica at once: the admin is
+    upserted on a unique username, so concurrent boots create it exactly
+    once, and a boot that failed halfway is simply retried by the next one.
+
+    """
+
     async with MongoDBConnectionManager() as db:
-        user = await db.users.find_one()
+        user = await db.users.find_one({}, {"_id": 1})
         if user:
             return None
 
+        try:
+            await db.users.create_index("username", unique=True)
+        except OperationFailure as e:
+            logging.warning(f"Could not create unique index on usernames: {e}")
+
         admin_user = UserInDB(
             username="admin",
             hashed_password=get_password_hash("admin"),
             scopes=list(SCOPES.keys()),
             disabled=False,
         )
-        await db.users.insert_one(admin_user.model_dump())
+        try:
+            result = await db.users.update_one(
+                {"username": admin_user.username},
+                {"$setOnInsert": admin_user.model_dump()},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another process upserted it first
+            return None
+        if result.upserted_id is None:
+            return None
+
+        await bus.notify(db, "users", "insert")
         return User(**admin_user.model_dump())
@@ -0,0 +1,46 @@
+import time
+
+from typing import Any
+from collections import OrderedDict
+
+
+class TTLCache:
+    """In-process cache with per-entry expiry and a bound on its size.
+
+    Entries can go stale when other processes write, so caches are
+    subscribed to the invalidation bus (see src/invalidation.py) and the TTL
+    only bounds staleness if events are missed.
+
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires < time.monotonic():
+            self.entries.pop(key, None)
+            return None
+
+        return value
+
+    def set(self, key: str, value: Any):
+        if self.ttl <= 0:
+            return
+
+        self.entries.pop(key, None)
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,88 @@
+"""Management commands.
+
+Usage
+-----
+    $ python -m src.cli create-admin
+    $ python -m src.cli startup-report
+    $ python -m src.cli reconcile [--delete]
+
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import importlib
+
+from datetime import timedelta
+
+
+async def create_admin(_: argparse.Namespace):
+    """Creates the default admin user if the database has no users."""
+
+    from src.auth import create_admin_user
+
+    user = await create_admin_user()
+    print("Admin user created" if user else "Users already exist, nothing to do")
+
+
+async def startup_report(_: argparse.Namespace):
+    """Prints the time spent importing the app and in each startup phase."""
+
+    start = time.perf_counter()
+    app = importlib.import_module("src.app").app
+    report = {"import": time.perf_counter() - start}
+
+    async with app.router.lifespan_context(app) as state:
+        report.update(state["startup"])
+
+    print(json.dumps({name: round(s * 1000, 1) for name, s in report.items()}))
+
+
+async def reconcile(args: argparse.Namespace):
+    """Deletes bucket objects without a meme and reports memes without object."""
+
+    from src.minio.reconcile import reconcile
+
+    report = await reconcile(
+        dry_run=not args.delete,
+        grace=timedelta(minutes=args.grace_minutes),
+        batch_size=args.batch_size,
+    )
+    print(json.dumps(report, indent=2))
+
+
+COMMANDS = {
+    "create-admin": create_admin,
+    "startup-report": startup_report,
+    "reconcile": reconcile,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m src.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parsers = {
+        name: subparsers.add_parser(name, help=command.__doc__)
+        for name, command in COMMANDS.items()
+    }
+
+    parsers["reconcile"].add_argument(
+        "--delete",
+        action="store_true",
+        help="delete orphan objects, by default they are only reported",
+    )
+    parsers["reconcile"].add_argument(
+        "--grace-minutes",
+        type=int,
+        default=60,
+        help="keep orphans younger than this, their upload may be in progress",
+    )
+    parsers["reconcile"].add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
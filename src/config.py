@@ -1,6 +1,8 @@
 from os import getenv
 from dotenv import load_dotenv
 
+from src.utils import available_cpus
+
 
 # Load env vars
 load_dotenv()
@@ -34,6 +36,7 @@ MIDDLEWARE_CONFIG = {
 
 # Enviroment variables
 DEVELOPMENT = getenv("DEVELOPMENT", "true").lower() == "true"
+ADMIN_BOOTSTRAP = getenv("ADMIN_BOOTSTRAP", "true").lower() == "true"
 
 # MongoDB config
 MONGO_URI = getenv("MONGO_URI", "mongodb://localhost:27017")
@@ -44,9 +47,44 @@ SECRET_KEY = getenv("SECRET_KEY", "")
 ALGORITHM = getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_DURATION_MINUTES = int(getenv("ACCESS_TOKEN_DURATION_MINUTES", 60))
 
+# Users config
+USERS_EXPORT_BATCH_SIZE = int(getenv("USERS_EXPORT_BATCH_SIZE", 500))
+
 # MinIO config
 MINIO_URL = getenv("MINIO_URL", "minio-server:9000")
 MINIO_ACCESS_KEY = getenv("MINIO_ACCESS_KEY", "key")
 MINIO_SECRET_KEY = getenv("MINIO_SECRET_KEY", "secret")
 MINIO_SECURE = getenv("MINIO_SECURE", "true").lower() == "true"
 MINIO_BUCKET = getenv("MINIO_BUCKET", "fastapi")
+
+# Rate limiting config
+RATE_LIMIT_ENABLED = getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_LOGIN_PER_MINUTE = int(getenv("RATE_LIMIT_LOGIN_PER_MINUTE", 10))
+RATE_LIMIT_LOGIN_BURST = int(getenv("RATE_LIMIT_LOGIN_BURST", 5))
+RATE_LIMIT_UPLOAD_PER_MINUTE = int(getenv("RATE_LIMIT_UPLOAD_PER_MINUTE", 20))
+RATE_LIMIT_UPLOAD_BURST = int(getenv("RATE_LIMIT_UPLOAD_BURST", 5))
+RATE_LIMIT_DEFAULT_PER_MINUTE = int(getenv("RATE_LIMIT_DEFAULT_PER_MINUTE", 300))
+RATE_LIMIT_DEFAULT_BURST = int(getenv("RATE_LIMIT_DEFAULT_BURST", 60))
+
+# Upload admission config
+UPLOAD_MAX_BYTES = int(getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+UPLOAD_MAX_CONCURRENCY = int(getenv("UPLOAD_MAX_CONCURRENCY", 8))
+
+# Server config
+SERVER_HOST = getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(getenv("SERVER_PORT", 8000))
+SERVER_WORKERS = int(getenv("SERVER_WORKERS", 0)) or available_cpus()
+SERVER_KEEP_ALIVE = int(getenv("SERVER_KEEP_ALIVE", 5))
+SERVER_BACKLOG = int(getenv("SERVER_BACKLOG", 2048))
+SERVER_LIMIT_CONCURRENCY = int(getenv("SERVER_LIMIT_CONCURRENCY", 0)) or None
+FORWARDED_ALLOW_IPS = getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Cache invalidation config
+INVALIDATION_ENABLED = getenv("INVALIDATION_ENABLED", "true").lower() == "true"
+INVALIDATION_POLL_SECONDS = float(getenv("INVALIDATION_POLL_SECONDS", 1))
+USER_CACHE_TTL_SECONDS = float(getenv("USER_CACHE_TTL_SECONDS", 30))
+
+# Image cache config
+IMAGE_CACHE_DIR = getenv("IMAGE_CACHE_DIR", "/tmp/fastapi-image-cache")
+IMAGE_CACHE_MAX_BYTES = int(getenv("IMAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
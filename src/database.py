@@ -1,10 +1,37 @@
 import motor.motor_asyncio
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 from src.config import MONGO_URI, DATABASE_NAME
+from src.metrics import mongo_listeners
+
+
+# Process wide client, created by the app lifespan after the worker started
+client: AsyncIOMotorClient | None = None
+
+
+def connect():
+    global client
+    if client is None:
+        client = motor.motor_asyncio.AsyncIOMotorClient(
+            MONGO_URI, event_listeners=mongo_listeners()
+        )
+
+
+def disconnect():
+    global client
+    if client is not None:
+        client.close()
+        client = None
 
 
 class MongoDBConnectionManager:
+    """Yields the database of the shared client when the app is running.
+
+    Outside of the app (scripts, one-off commands) a dedicated client is
+    opened and closed around the block instead.
+
+    """
+
     def __init__(self):
         self.uri = MONGO_URI
         self.db_name = DATABASE_NAME
@@ -12,7 +39,13 @@ class MongoDBConnectionManager:
         self.db = None
 
     async def __aenter__(self) -> AsyncIOMotorDatabase:
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(self.uri)
+        if client is not None:
+            self.db = client[self.db_name]
+            return self.db
+
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(
+            self.uri, event_listeners=mongo_listeners()
+        )
         self.db = self.client[self.db_name]
         return self.db
 
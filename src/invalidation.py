@@ -0,0 +1,201 @@
+import asyncio
+import logging
+
+from typing import Callable
+from bson import ObjectId
+from pydantic import BaseModel
+from datetime import datetime, timedelta, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from src.database import MongoDBConnectionManager
+from src.config import INVALIDATION_POLL_SECONDS
+
+
+# Collections whose writes invalidate in-process caches
+COLLECTIONS = ("users", "memes", "likes")
+
+# Capped collection carrying the events when change streams are unavailable
+OUTBOX = "invalidations"
+OUTBOX_SIZE_BYTES = 8 * 1024 * 1024
+
+# ObjectIds are only ordered within a process, so the poller re-reads the
+# last seconds of the outbox to catch events from other writers
+OUTBOX_WINDOW_SECONDS = 5
+
+# The resume token fell off the oplog, events in between are lost
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class Invalidation(BaseModel):
+    collection: str
+    operation: str
+    # None when anything in the collection may be stale
+    key: str | None = None
+
+
+class InvalidationBus:
+    """Delivers write events of every process to the in-process caches.
+
+    On a replica set or sharded cluster each collection is tailed with a
+    change stream, resumed from its last token after a disconnect. On a
+    standalone server writers also record their events in a capped outbox
+    collection that is polled instead.
+
+    """
+
+    def __init__(self, collections: tuple[str, ...] = COLLECTIONS):
+        self.collections = collections
+        self.subscribers: dict[str, list[Callable[[Invalidation], None]]] = {
+            collection: [] for collection in collections
+        }
+        self.resume_tokens: dict[str, dict] = {}
+        self.tasks: list[asyncio.Task] = []
+        self.polling = False
+
+    def subscribe(self, collection: str, callback: Callable[[Invalidation], None]):
+        self.subscribers[collection].append(callback)
+
+    def publish(self, event: Invalidation):
+        for callback in self.subscribers.get(event.collection, []):
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error(f"Invalidation subscriber failed: {e}")
+
+    async def notify(
+        self,
+        db: AsyncIOMotorDatabase,
+        collection: str,
+        operation: str,
+        key: str | None = None,
+    ):
+        """Reports a write. Local caches are invalidated right away."""
+
+        event = Invalidation(collection=collection, operation=operation, key=key)
+        self.publish(event)
+
+        if self.polling and self.tasks:
+            try:
+                await db[OUTBOX].insert_one(event.model_dump())
+            except PyMongoError as e:
+                # The write itself succeeded, other processes just learn late
+                logging.error(f"Could not record invalidation {event}: {e}")
+
+    async def start(self):
+        try:
+            async with MongoDBConnectionManager() as db:
+                hello = await db.command("hello")
+            self.polling = "setName" not in hello and hello.get("msg") != "isdbgrid"
+        except PyMongoError as e:
+            logging.error(f"Could not detect change stream support: {e}")
+            self.polling = True
+
+        if self.polling:
+            await self.create_outbox()
+            self.tasks = [asyncio.create_task(self.poll())]
+        else:
+            self.tasks = [
+                asyncio.create_task(self.watch(collection))
+                for collection in self.collections
+            ]
+
+        mode = "polling" if self.polling else "change streams"
+        logging.info(f"Cache invalidation started using {mode}")
+
+    @property
+    def running(self) -> bool:
+        return bool(self.tasks)
+
+    async def create_outbox(self):
+        """Creates the capped outbox before any event can be written to it.
+
+        An insert into a missing collection would create it uncapped, so an
+        existing uncapped outbox is converted.
+
+        """
+
+        try:
+            async with MongoDBConnectionManager() as db:
+                try:
+                    await db.create_collection(
+                        OUTBOX, capped=True, size=OUTBOX_SIZE_BYTES
+                    )
+                except CollectionInvalid:
+                    options = await db[OUTBOX].options()
+                    if not options.get("capped"):
+                        await db.command(
+                            "convertToCapped", OUTBOX, size=OUTBOX_SIZE_BYTES
+                        )
+        except PyMongoError as e:
+            logging.error(f"Could not create the invalidation outbox: {e}")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        # Caches are not kept in sync from here on
+        for collection in self.collections:
+            self.publish(Invalidation(collection=collection, operation="flush"))
+
+    async def watch(self, collection: str):
+        delay = 1
+        while True:
+            try:
+                async with MongoDBConnectionManager() as db:
+                    async with db[collection].watch(
+                        resume_after=self.resume_tokens.get(collection)
+                    ) as stream:
+                        delay = 1
+                        async for change in stream:
+                            self.resume_tokens[collection] = stream.resume_token
+                            key = change.get("documentKey", {}).get("_id")
+                            self.publish(
+                                Invalidation(
+                                    collection=collection,
+                                    operation=change["operationType"],
+                                    key=str(key) if key is not None else None,
+                                )
+                            )
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_HISTORY_LOST:
+                    logging.error(f"Change stream on {collection} failed: {e}")
+                else:
+                    # Start over and flush, whatever happened meanwhile is unknown
+                    logging.warning(f"Change stream on {collection} lost history")
+                    self.resume_tokens.pop(collection, None)
+                    self.publish(Invalidation(collection=collection, operation="flush"))
+            except PyMongoError as e:
+                logging.error(f"Change stream on {collection} failed: {e}")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def poll(self):
+        since = ObjectId.from_datetime(datetime.now(timezone.utc))
+        seen: set[ObjectId] = set()
+
+        while True:
+            try:
+                async with MongoDBConnectionManager() as db:
+                    events = db[OUTBOX].find({"_id": {"$gte": since}}).sort("_id", 1)
+                    async for event in events:
+                        if event["_id"] not in seen:
+                            seen.add(event["_id"])
+                            self.publish(Invalidation(**event))
+
+                # Only moves forward once read, so an outage resumes from here
+                since = ObjectId.from_datetime(
+                    datetime.now(timezone.utc)
+                    - timedelta(seconds=OUTBOX_WINDOW_SECONDS)
+                )
+                seen = {id for id in seen if id >= since}
+            except PyMongoError as e:
+                logging.error(f"Polling invalidations failed: {e}")
+
+            await asyncio.sleep(INVALIDATION_POLL_SECONDS)
+
+
+bus = InvalidationBus()
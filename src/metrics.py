@@ -0,0 +1,200 @@
+import time
+import logging
+
+from contextlib import contextmanager
+from pymongo import monitoring
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["method", "route", "status"],
+)
+
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of the stages inside a request (database, object storage, CPU).",
+    ["stage"],
+    buckets=(
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    ),
+)
+
+
+IMAGE_CACHE_REQUESTS = Counter(
+    "image_cache_requests_total",
+    "Image reads served by the disk cache, by result.",
+    ["result"],
+)
+
+IMAGE_CACHE_BYTES_SAVED = Counter(
+    "image_cache_bytes_saved_total",
+    "Bytes served from the disk cache instead of object storage.",
+)
+
+STARTUP_DURATION = Gauge(
+    "startup_duration_seconds",
+    "Time spent in each startup phase of the worker.",
+    ["phase"],
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records the wall time of the enclosed block under the given stage."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command sent to MongoDB as a `mongo.<command>` stage."""
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        STAGE_LATENCY.labels(f"mongo.{event.command_name}").observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        STAGE_LATENCY.labels(f"mongo.{event.command_name}").observe(
+            event.duration_micros / 1e6
+        )
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Times connection setup and pool checkout, which commands do not cover.
+
+    `mongo.connect` is the TCP/TLS handshake and authentication of a new
+    connection, `mongo.checkout` the wait for a connection from the pool.
+
+    """
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent):
+        if event.duration is not None:
+            STAGE_LATENCY.labels("mongo.connect").observe(event.duration)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        if event.duration is not None:
+            STAGE_LATENCY.labels("mongo.checkout").observe(event.duration)
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ):
+        if event.duration is not None:
+            STAGE_LATENCY.labels("mongo.checkout").observe(event.duration)
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent):
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent):
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent):
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent):
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent):
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent):
+        pass
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ):
+        pass
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent):
+        pass
+
+
+def mongo_listeners() -> list:
+    return [MongoCommandListener(), MongoPoolListener()]
+
+
+class MetricsMiddleware:
+    """Records request latency labeled with the matched route template.
+
+    The template (`/memes/{id}`) is used instead of the raw path to keep the
+    number of series bounded.
+
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - start)
+
+
+class StartupTimer:
+    """Times the phases of the app startup and reports them once ready."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+            STARTUP_DURATION.labels(name).set(self.phases[name])
+
+    def report(self) -> dict[str, float]:
+        self.phases["total"] = time.perf_counter() - self.start
+        STARTUP_DURATION.labels("total").set(self.phases["total"])
+        phases = ", ".join(
+            f"{name}: {seconds * 1000:.1f} ms"
+            for name, seconds in self.phases.items()
+            if name != "total"
+        )
+        logging.info(
+            f"Startup finished in {self.phases['total'] * 1000:.1f} ms ({phases})"
+        )
+        return self.phases
@@ -0,0 +1,294 @@
+import os
+import re
+import shutil
+import socket
+import asyncio
+import hashlib
+import logging
+import tempfile
+
+from collections import OrderedDict
+
+from src.minio.minio import get_minio_client
+from src.metrics import IMAGE_CACHE_BYTES_SAVED, IMAGE_CACHE_REQUESTS, timed
+from src.config import (
+    DEVELOPMENT,
+    MINIO_BUCKET,
+    SERVER_WORKERS,
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_BYTES,
+)
+
+
+# Multipart and encrypted uploads have ETags that are not the MD5 of the body
+MD5_ETAG = re.compile(r"[0-9a-f]{32}")
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class DiskCache:
+    """Bounded LRU cache of bucket objects on local disk.
+
+    Files are named after a hash of the object name and written to a
+    temporary file first, then renamed, so a cached file is always complete.
+    Downloads are checked against the ETag before being kept. Concurrent
+    misses on the same object share a single download.
+
+    Files handed out by `get` are pinned until `release`, so they are not
+    evicted while a response is still reading them. Evicted files are
+    deleted in a thread, and a key is not looked up again before its file
+    is gone.
+
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.pins: dict[str, int] = {}
+        self.size = 0
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.removing: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.load()
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                # Left behind by an interrupted download of this directory's
+                # previous owner, nobody else writes here
+                os.unlink(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(files):
+            for evicted in self.add(key, size):
+                self.unlink(evicted)
+
+    def add(self, key: str, size: int) -> list[str]:
+        """Records a cached file, returns the keys evicted to make room."""
+
+        self.size += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        return self.evict()
+
+    def evict(self) -> list[str]:
+        evicted = []
+        newest = next(reversed(self.entries), None)
+        for key in list(self.entries):
+            if self.size <= self.max_bytes:
+                break
+            # The newest entry is kept even if it is larger than the cap alone
+            if key == newest or self.pins.get(key):
+                continue
+
+            self.size -= self.entries.pop(key)
+            evicted.append(key)
+        return evicted
+
+    def unlink(self, key: str):
+        try:
+            os.unlink(os.path.join(self.directory, key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Could not remove cached file {key}: {e}")
+
+    def remove(self, keys: list[str]):
+        """Deletes evicted files in a thread, large unlinks can take a while."""
+
+        for key in keys:
+            removal = asyncio.ensure_future(asyncio.to_thread(self.unlink, key))
+            self.removing[key] = removal
+            removal.add_done_callback(lambda _, key=key: self.removing.pop(key, None))
+
+    def pin(self, key: str):
+        self.pins[key] = self.pins.get(key, 0) + 1
+
+    def release(self, path: str):
+        """Allows the file returned by `get` to be evicted again."""
+
+        key = os.path.basename(path)
+        count = self.pins.get(key, 0) - 1
+        if count > 0:
+            self.pins[key] = count
+        else:
+            self.pins.pop(key, None)
+
+    def discard(self, key: str):
+        self.size -= self.entries.pop(key, 0)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "size": self.size,
+            "entries": len(self.entries),
+        }
+
+    async def get(self, object_name: str) -> str:
+        """Returns the path of a local copy of the object, pinned."""
+
+        key = hashlib.sha256(object_name.encode()).hexdigest()
+        path = os.path.join(self.directory, key)
+
+        self.pin(key)
+        try:
+            await self.load_object(object_name, key, path)
+        except BaseException:
+            self.release(path)
+            raise
+
+        return path
+
+    async def load_object(self, object_name: str, key: str, path: str):
+        removal = self.removing.get(key)
+        if removal is not None:
+            await asyncio.shield(removal)
+
+        if key not in self.inflight:
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                self.discard(key)
+            else:
+                self.remove(self.add(key, size))
+                self.hit(size)
+                return
+
+        fill = self.inflight.get(key)
+        if fill is None:
+            fill = asyncio.ensure_future(
+                asyncio.to_thread(self.fetch, object_name, path)
+            )
+            self.inflight[key] = fill
+            fill.add_done_callback(lambda _: self.inflight.pop(key, None))
+
+            size = await asyncio.shield(fill)
+            self.remove(self.add(key, size))
+            self.misses += 1
+            IMAGE_CACHE_REQUESTS.labels("miss").inc()
+            return
+
+        # Another request is already downloading this object
+        size = await asyncio.shield(fill)
+        self.hit(size)
+
+    def hit(self, size: int):
+        self.hits += 1
+        self.bytes_saved += size
+        IMAGE_CACHE_REQUESTS.labels("hit").inc()
+        IMAGE_CACHE_BYTES_SAVED.inc(size)
+
+    def fetch(self, object_name: str, path: str) -> int:
+        """Downloads the object to `path`, returns its size."""
+
+        with timed("minio.get_object"):
+            response = get_minio_client().get_object(MINIO_BUCKET, object_name)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            etag = response.headers.get("ETag", "").strip('"')
+            length = int(response.headers.get("Content-Length", -1))
+            digest = hashlib.md5(usedforsecurity=False)
+            size = 0
+
+            with timed("image_cache.fill"), os.fdopen(fd, "wb") as f:
+                for chunk in response.stream(READ_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+
+            if length >= 0 and size != length:
+                raise ValueError(f"Truncated download of {object_name}")
+            if MD5_ETAG.fullmatch(etag) and digest.hexdigest() != etag:
+                raise ValueError(f"ETag mismatch for {object_name}")
+
+            os.replace(tmp_path, path)
+            return size
+
+        except BaseException:
+            logging.error(f"Could not cache {object_name}")
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        finally:
+            response.close()
+            response.release_conn()
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def worker_directory(root: str) -> str:
+    """Returns the cache directory owned by this worker process.
+
+    Workers never share files, so nobody evicts or cleans up a file another
+    worker is serving. The directory of a dead worker of this host is taken
+    over to keep its cache warm across restarts, the others are removed.
+
+    """
+
+    host = socket.gethostname()
+    directory = os.path.join(root, f"{host}-{os.getpid()}")
+    os.makedirs(root, exist_ok=True)
+
+    dead = []
+    for entry in os.scandir(root):
+        name, _, pid = entry.name.rpartition("-")
+        if entry.is_dir() and name == host and pid.isdigit():
+            if not is_alive(int(pid)):
+                dead.append(entry.path)
+
+    for path in dead:
+        if not os.path.exists(directory):
+            try:
+                os.rename(path, directory)
+                continue
+            except OSError:
+                # Taken over by another worker starting at the same time
+                pass
+        shutil.rmtree(path, ignore_errors=True)
+
+    return directory
+
+
+# Built at startup, so importing this module stays cheap
+image_cache: DiskCache | None = None
+
+
+def get_image_cache() -> DiskCache:
+    """Returns the worker's image cache, building it on first use.
+
+    Building scans the cache directory, the app does it in a thread at
+    startup so no request waits on it.
+
+    """
+
+    global image_cache
+    if image_cache is None:
+        # The cap covers all the workers of the server
+        workers = 1 if DEVELOPMENT else SERVER_WORKERS
+        image_cache = DiskCache(
+            worker_directory(IMAGE_CACHE_DIR), IMAGE_CACHE_MAX_BYTES // workers
+        )
+    return image_cache
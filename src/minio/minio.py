@@ -6,6 +6,7 @@ from fastapi import UploadFile
 from minio.error import S3Error
 from datetime import datetime, timedelta
 
+from src.metrics import timed
 from src.config import (
     MINIO_URL,
     MINIO_ACCESS_KEY,
@@ -15,12 +16,20 @@ from src.config import (
 )
 
 
-minio_client = Minio(
-    MINIO_URL,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=MINIO_SECURE,
-)
+# Built on first use, so importing this module stays cheap
+minio_client: Minio | None = None
+
+
+def get_minio_client() -> Minio:
+    global minio_client
+    if minio_client is None:
+        minio_client = Minio(
+            MINIO_URL,
+            access_key=MINIO_ACCESS_KEY,
+            secret_key=MINIO_SECRET_KEY,
+            secure=MINIO_SECURE,
+        )
+    return minio_client
 
 
 def is_image(filename: str, content_type: str) -> bool:
@@ -34,9 +43,10 @@ def is_image(filename: str, content_type: str) -> bool:
 
 def generate_presigned_url(object_name, duration=604800):
     try:
-        url = minio_client.presigned_get_object(
-            MINIO_BUCKET, object_name, expires=timedelta(seconds=duration)
-        )
+        with timed("minio.presign"):
+            url = get_minio_client().presigned_get_object(
+                MINIO_BUCKET, object_name, expires=timedelta(seconds=duration)
+            )
         logging.debug(f"Generated presigned URL: {url}")
         return url
     except S3Error as e:
@@ -46,21 +56,27 @@ def generate_presigned_url(object_name, duration=604800):
 
 async def upload_file(file: UploadFile, object_name: str) -> tuple[str | None, dict]:
     try:
+        minio_client = get_minio_client()
+
         # Check if the bucket exists; create it if it doesn't
-        if not minio_client.bucket_exists(MINIO_BUCKET):
+        with timed("minio.bucket_exists"):
+            bucket_exists = minio_client.bucket_exists(MINIO_BUCKET)
+        if not bucket_exists:
             minio_client.make_bucket(MINIO_BUCKET)
 
         # Read the file content
-        file_content = await file.read()
+        with timed("upload.read"):
+            file_content = await file.read()
         file_size = file.size if file.size else len(file_content)
 
         if file_size <= 0:
             raise ValueError("File is empty")
 
         # Upload the file to MinIO
-        minio_client.put_object(
-            MINIO_BUCKET, object_name, io.BytesIO(file_content), file_size
-        )
+        with timed("minio.put_object"):
+            minio_client.put_object(
+                MINIO_BUCKET, object_name, io.BytesIO(file_content), file_size
+            )
 
         # Generate a presigned URL for the uploaded file
         seven_days = 604800
@@ -85,9 +101,21 @@ async def upload_file(file: UploadFile, object_name: str) -> tuple[str | None, d
         return (str(e), {})
 
 
+def delete_file(object_name) -> bool:
+    try:
+        with timed("minio.remove_object"):
+            get_minio_client().remove_object(MINIO_BUCKET, object_name)
+        logging.debug(f"File {object_name} deleted from {MINIO_BUCKET}.")
+        return True
+    except S3Error as e:
+        logging.error(f"Error deleting file: {e}")
+        return False
+
+
 def download_file(object_name, file_path):
     try:
-        file = minio_client.get_object(MINIO_BUCKET, object_name, file_path)
+        with timed("minio.get_object"):
+            file = get_minio_client().get_object(MINIO_BUCKET, object_name, file_path)
         logging.debug(f"File {object_name} downloaded successfully to {file_path}.")
         return file
     except S3Error as e:
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+
+from itertools import islice
+from typing import AsyncIterator
+from minio.datatypes import Object
+from minio.deleteobjects import DeleteObject
+from datetime import datetime, timedelta, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from src.config import MINIO_BUCKET
+from src.metrics import timed
+from src.minio.minio import get_minio_client
+from src.database import MongoDBConnectionManager
+
+
+# Number of orphans listed in the report, the counts cover all of them
+REPORT_SAMPLE_SIZE = 20
+
+
+async def iter_objects(batch_size: int) -> AsyncIterator[Object]:
+    """Yields the objects of the bucket in key order.
+
+    The MinIO client is blocking, so pages are pulled in a thread.
+
+    """
+
+    objects = get_minio_client().list_objects(MINIO_BUCKET, recursive=True)
+    while True:
+        with timed("minio.list_objects"):
+            batch = await asyncio.to_thread(lambda: list(islice(objects, batch_size)))
+        if not batch:
+            return
+        for obj in batch:
+            yield obj
+
+
+async def iter_object_names(
+    db: AsyncIOMotorDatabase, batch_size: int
+) -> AsyncIterator[str]:
+    """Yields the `object_name` of every meme in the same order as the bucket.
+
+    Both sides compare strings by UTF-8 bytes, so a single merge pass over
+    the two sorted streams matches them. Without the `object_name` index
+    the server sorts on disk instead of failing on its memory limit.
+
+    """
+
+    cursor = db.memes.find(
+        {"object_name": {"$type": "string"}}, {"_id": 0, "object_name": 1}
+    )
+    cursor = cursor.sort("object_name", 1).allow_disk_use(True)
+    async for meme in cursor.batch_size(batch_size):
+        yield meme["object_name"]
+
+
+async def remove_objects(names: list[str]) -> int:
+    """Deletes the given objects in one request, returns the number of errors."""
+
+    def remove() -> int:
+        errors = get_minio_client().remove_objects(
+            MINIO_BUCKET, [DeleteObject(name) for name in names]
+        )
+        count = 0
+        for error in errors:
+            logging.error(f"Error deleting {error.name}: {error.message}")
+            count += 1
+        return count
+
+    with timed("minio.remove_objects"):
+        return await asyncio.to_thread(remove)
+
+
+async def reconcile(
+    dry_run: bool = True,
+    grace: timedelta = timedelta(hours=1),
+    batch_size: int = 1000,
+) -> dict:
+    """Finds objects without a meme and memes without an object.
+
+    Orphan objects older than `grace` are deleted, unless `dry_run`. Younger
+    ones may belong to an upload whose meme is not inserted yet. Memes
+    missing their object are only reported. A dry run writes nothing, the
+    `object_name` index is only created when deleting.
+
+    Returns
+    -------
+    dict
+
+        counts and a sample of names for each kind of mismatch.
+
+    """
+
+    cutoff = datetime.now(timezone.utc) - grace
+    report = {
+        "dry_run": dry_run,
+        "objects": 0,
+        "documents": 0,
+        "orphan_objects": 0,
+        "recent_orphan_objects": 0,
+        "deleted_objects": 0,
+        "delete_errors": 0,
+        "missing_objects": 0,
+        "orphan_objects_sample": [],
+        "missing_objects_sample": [],
+    }
+    to_delete: list[str] = []
+
+    async def flush():
+        if to_delete and not dry_run:
+            errors = await remove_objects(to_delete)
+            report["deleted_objects"] += len(to_delete) - errors
+            report["delete_errors"] += errors
+        to_delete.clear()
+
+    async with MongoDBConnectionManager() as db:
+        if not dry_run:
+            await db.memes.create_index("object_name")
+
+        objects = iter_objects(batch_size)
+        names = iter_object_names(db, batch_size)
+        obj = await anext(objects, None)
+        name = await anext(names, None)
+
+        while obj is not None or name is not None:
+            if name is None or (obj is not None and obj.object_name < name):
+                # Object without meme
+                report["objects"] += 1
+                if obj.last_modified and obj.last_modified > cutoff:
+                    report["recent_orphan_objects"] += 1
+                else:
+                    report["orphan_objects"] += 1
+                    if len(report["orphan_objects_sample"]) < REPORT_SAMPLE_SIZE:
+                        report["orphan_objects_sample"].append(obj.object_name)
+                    to_delete.append(obj.object_name)
+                    if len(to_delete) == batch_size:
+                        await flush()
+                obj = await anext(objects, None)
+
+            elif obj is None or name < obj.object_name:
+                # Meme without object
+                report["documents"] += 1
+                report["missing_objects"] += 1
+                if len(report["missing_objects_sample"]) < REPORT_SAMPLE_SIZE:
+                    report["missing_objects_sample"].append(name)
+                name = await anext(names, None)
+
+            else:
+                # Matched, several memes may share the object
+                report["objects"] += 1
+                matched = name
+                while name == matched:
+                    report["documents"] += 1
+                    name = await anext(names, None)
+                obj = await anext(objects, None)
+
+        await flush()
+
+    return report
@@ -1,10 +1,15 @@
 from typing import Optional
 from datetime import timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi import APIRouter, Form, HTTPException, Depends, Security, status
+from fastapi import APIRouter, Form, HTTPException, Depends, Response, Security, status
 
+from src.invalidation import bus
+from src.schemas.filter import UsersFilter
 from src.database import MongoDBConnectionManager
-from src.config import ACCESS_TOKEN_DURATION_MINUTES
+from src.config import ACCESS_TOKEN_DURATION_MINUTES, USERS_EXPORT_BATCH_SIZE
 from src.auth import (
     User,
     Token,
@@ -110,6 +115,7 @@ async def register_user(
         )
 
         await db.users.insert_one(new_user.model_dump())
+        await bus.notify(db, "users", "insert")
 
     raise HTTPException(status_code=status.HTTP_201_CREATED, detail="User created")
 
@@ -146,6 +152,7 @@ async def create_user(
         await db.users.insert_one(
             UserInDB(**user.model_dump(), hashed_password=hashed_password).model_dump()
         )
+        await bus.notify(db, "users", "insert")
 
     raise HTTPException(status_code=status.HTTP_201_CREATED, detail="User created")
 
@@ -206,6 +213,7 @@ async def update_user(
                     ).model_dump()
                 },
             )
+            await bus.notify(db, "users", "update")
         raise HTTPException(status_code=status.HTTP_200_OK, detail="User updated")
 
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
@@ -229,6 +237,7 @@ async def delete_user(
     async with MongoDBConnectionManager() as db:
         if "admin" in current_user.scopes:
             result = await db.users.delete_one({"username": name})
+            await bus.notify(db, "users", "delete")
 
             if result.deleted_count == 0:
                 raise HTTPException(
@@ -245,26 +254,105 @@ async def delete_user(
 
         if "user.me" in current_user.scopes and current_user.username == name:
             await db.users.update_one({"username": name}, {"$set": {"disabled": True}})
+            await bus.notify(db, "users", "update")
             raise HTTPException(status_code=status.HTTP_200_OK, detail="User deleted")
 
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
 
 
+def users_query(filter: UsersFilter) -> dict:
+    query = {}
+    if filter.disabled is not None:
+        query["disabled"] = filter.disabled
+    if filter.scope:
+        query["scopes"] = filter.scope
+    return query
+
+
 @router.get("/user/", response_model=list[User])
-async def get_all_users(_: User = Security(current_active_user, scopes=["user.all"])):
-    """Lists all existing users.
+async def get_all_users(
+    response: Response,
+    filter: UsersFilter = Depends(UsersFilter),
+    _: User = Security(current_active_user, scopes=["user.all"]),
+):
+    """Lists existing users, one page at a time.
+
+    Parameters
+    ----------
+    after: Optional(str)
+
+        cursor returned in the X-Next-Cursor header of the previous page
+
+    limit: int = 50
+
+    disabled: Optional(bool)
+
+    scope: Optional(str)
 
     Returns
     -------
     list[User]
 
-        list of all users's info. Passwords not included.
+        list of users's info. Passwords not included.
 
     """
 
+    query = users_query(filter)
+    if filter.after:
+        try:
+            query["_id"] = {"$gt": ObjectId(filter.after)}
+        except InvalidId:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+
     async with MongoDBConnectionManager() as db:
-        users = await db.users.find({}, {"_id": 0, "hashed_password": 0}).to_list(None)
-    if not users:
+        cursor = db.users.find(query, {"hashed_password": 0}).sort("_id", 1)
+        users = await cursor.limit(filter.limit).to_list(filter.limit)
+    if not users and not filter.after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
 
+    if len(users) == filter.limit:
+        response.headers["X-Next-Cursor"] = str(users[-1]["_id"])
+
     return [User(**user) for user in users]
+
+
+@router.get("/user/export")
+async def export_users(
+    filter: UsersFilter = Depends(UsersFilter),
+    _: User = Security(current_active_user, scopes=["user.all"]),
+):
+    """Streams every matching user as newline delimited JSON.
+
+    Parameters
+    ----------
+    disabled: Optional(bool)
+
+    scope: Optional(str)
+
+    Returns
+    -------
+    application/x-ndjson
+
+        one user per line. Passwords not included.
+
+    """
+
+    query = users_query(filter)
+
+    async def stream():
+        async with MongoDBConnectionManager() as db:
+            cursor = db.users.find(query, {"_id": 0, "hashed_password": 0})
+            cursor = cursor.sort("_id", 1).batch_size(USERS_EXPORT_BATCH_SIZE)
+
+            lines = []
+            async for user in cursor:
+                lines.append(User(**user).model_dump_json())
+                if len(lines) == USERS_EXPORT_BATCH_SIZE:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,15 +1,29 @@
 import os
 import logging
+import mimetypes
 
 from uuid import uuid4
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime, timedelta
+from minio.error import S3Error
+from pymongo.errors import PyMongoError
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from fastapi import APIRouter, File, UploadFile, HTTPException, status, Depends
 
 from src.schemas.filter import MemesFilter
 from src.auth import User, current_active_user
+from src.config import UPLOAD_MAX_BYTES
+from src.invalidation import bus
 from src.database import MongoDBConnectionManager
-from src.minio.minio import upload_file, is_image, generate_presigned_url
+from src.minio.cache import get_image_cache
+from src.minio.minio import (
+    upload_file,
+    delete_file,
+    is_image,
+    generate_presigned_url,
+)
 
 
 router = APIRouter(prefix="/memes")
@@ -45,6 +59,7 @@ async def get_memes(filter: MemesFilter = Depends(MemesFilter)):
                             }
                         },
                     )
+                    await bus.notify(db, "memes", "update", id)
                 except Exception as e:
                     logging.error(e)
                     logging.error(f"Error generating presigned URL for: {id}")
@@ -69,6 +84,62 @@ async def get_meme(id: str):
     return meme
 
 
+@router.get("/{id}/image")
+async def get_meme_image(id: str):
+    """Serves the meme image from the local disk cache.
+
+    Object names are never reused, so clients may cache the response too.
+
+    """
+
+    try:
+        meme_id = ObjectId(id)
+    except InvalidId:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Meme not found"
+        )
+
+    async with MongoDBConnectionManager() as db:
+        meme = await db.memes.find_one(
+            {"_id": meme_id}, {"object_name": 1, "filename": 1}
+        )
+
+    if not meme:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Meme not found"
+        )
+
+    cache = get_image_cache()
+    try:
+        path = await cache.get(meme["object_name"])
+        if not os.path.isfile(path):
+            # Removed since it was looked up, treat it as a miss
+            cache.release(path)
+            path = await cache.get(meme["object_name"])
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+            )
+        logging.error(f"Error fetching image {meme['object_name']}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Image error"
+        )
+    except (ValueError, OSError) as e:
+        logging.error(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Image error"
+        )
+
+    media_type, _ = mimetypes.guess_type(meme.get("filename", meme["object_name"]))
+    return FileResponse(
+        path,
+        media_type=media_type or "application/octet-stream",
+        headers={"Cache-Control": "public, max-age=604800, immutable"},
+        background=BackgroundTask(cache.release, path),
+    )
+
+
 @router.put("/{id}")
 async def update_meme(id: str, user: User = Depends(current_active_user)):
     async with MongoDBConnectionManager() as db:
@@ -92,6 +163,9 @@ async def update_meme(id: str, user: User = Depends(current_active_user)):
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Update failed",
                 )
+            await bus.notify(
+                db, "likes", "insert", str(add_user_like_result.inserted_id)
+            )
 
             # Increment like to post
             inc_like_result = await db.memes.update_one(
@@ -115,6 +189,7 @@ async def update_meme(id: str, user: User = Depends(current_active_user)):
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Update failed",
                 )
+            await bus.notify(db, "likes", "delete")
 
             # Substract like to post
             dec_like_result = await db.memes.update_one(
@@ -127,6 +202,8 @@ async def update_meme(id: str, user: User = Depends(current_active_user)):
                     detail="Update failed",
                 )
 
+        await bus.notify(db, "memes", "update", id)
+
         return await db.memes.find_one({"_id": ObjectId(id)}, {"_id": 0, "likes": 1})
 
 
@@ -148,8 +225,8 @@ async def upload(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Only image files"
         )
 
-    # Validate file size (20MB)
-    if not file.size or file.size > 20 * 1024 * 1024:
+    # Validate file size
+    if not file.size or file.size > UPLOAD_MAX_BYTES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="File too large"
         )
@@ -180,6 +257,16 @@ async def upload(
 
     # Save meme to MongoDB
     async with MongoDBConnectionManager() as db:
-        result = await db.memes.insert_one(meme)
+        try:
+            result = await db.memes.insert_one(meme)
+        except PyMongoError as e:
+            # Do not leave the object behind without its meme
+            logging.error(f"Error saving meme {object_name}: {e}")
+            delete_file(object_name)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Upload failed",
+            )
+        await bus.notify(db, "memes", "insert", str(result.inserted_id))
 
     return {"id": str(result.inserted_id), "url": url}
@@ -21,3 +21,24 @@ class MemesFilter(BaseModel):
         gt=0,
         lt=101,
     )
+
+
+class UsersFilter(BaseModel):
+    after: str | None = Field(
+        None,
+        title="Cursor",
+        description="Return users after this cursor (X-Next-Cursor header)",
+    )
+    limit: int = Field(
+        50,
+        title="Page size",
+        description="The number of users to retrieve per page",
+        gt=0,
+        lt=501,
+    )
+    disabled: bool | None = Field(
+        None, title="Disabled", description="Only disabled or enabled users"
+    )
+    scope: str | None = Field(
+        None, title="Scope", description="Only users granted this scope"
+    )
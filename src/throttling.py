@@ -0,0 +1,357 @@
+import math
+import time
+import logging
+
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from jose import JWTError, jwt
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.database import MongoDBConnectionManager
+from src.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_LOGIN_PER_MINUTE,
+    RATE_LIMIT_LOGIN_BURST,
+    RATE_LIMIT_UPLOAD_PER_MINUTE,
+    RATE_LIMIT_UPLOAD_BURST,
+    RATE_LIMIT_DEFAULT_PER_MINUTE,
+    RATE_LIMIT_DEFAULT_BURST,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_CONCURRENCY,
+)
+
+
+# Route classes: (requests per second, burst size)
+RATE_LIMITS = {
+    "login": (RATE_LIMIT_LOGIN_PER_MINUTE / 60, RATE_LIMIT_LOGIN_BURST),
+    "upload": (RATE_LIMIT_UPLOAD_PER_MINUTE / 60, RATE_LIMIT_UPLOAD_BURST),
+    "default": (RATE_LIMIT_DEFAULT_PER_MINUTE / 60, RATE_LIMIT_DEFAULT_BURST),
+}
+
+# Room for the multipart boundaries and form fields around the image
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Login forms are tiny, larger bodies are not buffered to find the username
+LOGIN_BODY_MAX_BYTES = 16 * 1024
+
+
+def route_class(method: str, path: str) -> str:
+    if method == "POST" and path in ("/token", "/register"):
+        return "login"
+    if is_upload(method, path):
+        return "upload"
+    return "default"
+
+
+def is_upload(method: str, path: str) -> bool:
+    return method == "POST" and path == "/memes/"
+
+
+def client_identity(scope: Scope) -> str:
+    """Returns the user of a valid bearer token, or the client IP otherwise.
+
+    Only tokens signed with our key are trusted, so a forged `sub` cannot
+    be used to drain somebody else's bucket.
+
+    """
+
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                break
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except JWTError:
+                break
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+            break
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def read_login_username(
+    scope: Scope, receive: Receive
+) -> tuple[str | None, Receive]:
+    """Returns the `username` field of an urlencoded login form.
+
+    The body is buffered and replayed to the app through the returned
+    receive callable.
+
+    """
+
+    headers = dict(scope.get("headers", []))
+    content_type = headers.get(b"content-type", b"")
+    if not content_type.startswith(b"application/x-www-form-urlencoded"):
+        return None, receive
+
+    messages: list[Message] = []
+    body = b""
+    more_body = True
+    while more_body and len(body) <= LOGIN_BODY_MAX_BYTES:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    async def replay() -> Message:
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    if more_body:
+        return None, replay
+
+    form = parse_qs(body.decode("utf-8", "replace"))
+    return form.get("username", [None])[0], replay
+
+
+class MemoryBackend:
+    """Token buckets kept in the worker process, bounded in number of keys."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, last = self.buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - last) * rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+        return retry_after
+
+
+class MongoBackend:
+    """Token buckets shared between workers and replicas through MongoDB.
+
+    Each hit is a single atomic pipeline update timed with the server clock,
+    so every process sees the same buckets. Idle buckets expire via a TTL
+    index.
+
+    """
+
+    def __init__(self, collection: str = "rate_limits"):
+        self.collection_name = collection
+        self.indexed = False
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        async with MongoDBConnectionManager() as db:
+            return await self._hit(db[self.collection_name], key, rate, burst)
+
+    async def _hit(self, collection, key: str, rate: float, burst: int) -> float:
+        if not self.indexed:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+            self.indexed = True
+
+        elapsed = {
+            "$divide": [
+                {"$subtract": ["$$NOW", {"$ifNull": ["$ts", "$$NOW"]}]},
+                1000,
+            ]
+        }
+        refilled = {
+            "$min": [
+                burst,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", burst]},
+                        {"$multiply": [elapsed, rate]},
+                    ]
+                },
+            ]
+        }
+        idle_ms = math.ceil(burst / rate * 1000)
+        pipeline = [
+            {"$set": {"tokens": refilled, "ts": "$$NOW"}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {
+                "$set": {
+                    "tokens": {
+                        "$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]
+                    },
+                    "expires_at": {"$add": ["$$NOW", idle_ms]},
+                }
+            },
+        ]
+
+        try:
+            bucket = await collection.find_one_and_update(
+                {"_id": key},
+                pipeline,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Two first hits raced on the upsert, the bucket exists now
+            bucket = await collection.find_one_and_update(
+                {"_id": key}, pipeline, return_document=ReturnDocument.AFTER
+            )
+
+        if not bucket or bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+
+def get_backend(name: str):
+    if name == "mongo":
+        return MongoBackend()
+    if name != "memory":
+        logging.warning(f"Unknown rate limit backend {name!r}, using memory")
+    return MemoryBackend()
+
+
+def too_many_requests(detail: str, status_code: int, retry_after: float):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """Per client, per route class token bucket rate limiter.
+
+    Logins are also keyed by the submitted username, so a client guessing
+    passwords does not lock out everybody behind the same address.
+
+    """
+
+    def __init__(self, app: ASGIApp, backend: str = RATE_LIMIT_BACKEND):
+        self.app = app
+        self.backend = get_backend(backend)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+
+        name = route_class(scope["method"], scope["path"])
+        rate, burst = RATE_LIMITS[name]
+        if rate <= 0:
+            return await self.app(scope, receive, send)
+
+        identity = client_identity(scope)
+        buckets = [(f"{name}:{identity}", rate, burst)]
+        if name == "login":
+            username, receive = await read_login_username(scope, receive)
+            if username:
+                # Clients sharing an address do not lock each other out
+                buckets = [(f"login:{identity}:username:{username}", rate, burst)]
+                # Trying many usernames is still bounded per client
+                default_rate, default_burst = RATE_LIMITS["default"]
+                if default_rate > 0:
+                    buckets.append((f"default:{identity}", default_rate, default_burst))
+
+        retry_after = 0.0
+        try:
+            for key, rate, burst in buckets:
+                retry_after = max(retry_after, await self.backend.hit(key, rate, burst))
+        except PyMongoError as e:
+            # Fail open, an unavailable limiter must not take the API down
+            logging.error(f"Rate limiter unavailable: {e}")
+            retry_after = 0.0
+
+        if retry_after > 0:
+            response = too_many_requests("Too many requests", 429, retry_after)
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+class BodyTooLarge(Exception):
+    """Raised to the app reading an upload body past the size limit."""
+
+
+class UploadGateMiddleware:
+    """Bounds the number of uploads in flight in this worker.
+
+    Oversized bodies are refused from their Content-Length before being
+    read. Bodies without one (chunked) are counted as they are received and
+    cut off with a 413 once over the limit. Uploads over the concurrency
+    limit are shed with a 503 instead of queueing their payloads in memory.
+
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_concurrency: int = UPLOAD_MAX_CONCURRENCY,
+        max_bytes: int = UPLOAD_MAX_BYTES,
+    ):
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not is_upload(scope["method"], scope["path"]):
+            return await self.app(scope, receive, send)
+
+        limit = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit():
+                if int(value) > limit:
+                    response = JSONResponse({"detail": "File too large"}, 413)
+                    return await response(scope, receive, send)
+                break
+
+        if self.in_flight >= self.max_concurrency:
+            response = too_many_requests("Too many uploads in progress", 503, 1)
+            return await response(scope, receive, send)
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def receive_wrapper() -> Message:
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    too_large = True
+                    raise BodyTooLarge()
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal started
+            # The app's answer to the aborted read is replaced by the 413
+            if too_large and not started:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception:
+            # FastAPI may wrap the error while parsing the form
+            if not too_large:
+                raise
+        finally:
+            self.in_flight -= 1
+
+        if too_large and not started:
+            response = JSONResponse({"detail": "File too large"}, 413)
+            await response(scope, receive, send)
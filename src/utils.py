@@ -1 +1,47 @@
-# PROTO: implement global wise utils for the project
+import os
+import math
+
+
+def read_cpu_quota() -> float | None:
+    """Returns the CPU quota of the container (cgroup v2 or v1), if any."""
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use.
+
+    `os.cpu_count()` reports every CPU of the host, which overcounts both
+    under CPU affinity and in containers limited by a cgroup quota.
+
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    quota = read_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+
+    return max(1, cpus)